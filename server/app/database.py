@@ -1,9 +1,13 @@
 ﻿"""
 Database configuration for the OMR evaluation system.
 """
-from sqlalchemy import create_engine
+import hashlib
+from filelock import FileLock
+from sqlalchemy import event
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from pathlib import Path
 
 # Create data directory if it doesn't exist
@@ -11,35 +15,110 @@ DATA_DIR = Path("data")
 DATA_DIR.mkdir(exist_ok=True)
 
 # Database configuration
-SQLALCHEMY_DATABASE_URL = f"sqlite:///{DATA_DIR}/omr_evaluation.db"
+DATABASE_PATH = DATA_DIR / "omr_evaluation.db"
+SQLALCHEMY_DATABASE_URL = f"sqlite+aiosqlite:///{DATABASE_PATH}"
 
-# Create engine with SQLite configuration
-engine = create_engine(
+# Schema bootstrap coordination between workers
+SCHEMA_LOCK_PATH = DATA_DIR / ".schema.lock"
+SCHEMA_VERSION_PATH = DATA_DIR / ".schema_version"
+
+# Create async engine with SQLite configuration.
+# Connections are pooled so each request reuses an open handle (and its page cache)
+# instead of reopening the database file.
+engine = create_async_engine(
     SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Needed for SQLite
+    connect_args={"check_same_thread": False},  # Needed for SQLite
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=5,
+    max_overflow=10,
+    pool_recycle=3600,
+    pool_pre_ping=True
 )
 
+
+@event.listens_for(engine.sync_engine, "connect")
+def _set_sqlite_pragma(dbapi_connection, connection_record):
+    """
+    Tune every new SQLite connection.
+    WAL lets readers proceed while a writer commits, and synchronous=NORMAL
+    drops the extra fsync per commit that is only needed in rollback-journal mode.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-65536")  # 64MB page cache
+    cursor.execute("PRAGMA mmap_size=268435456")  # 256MB memory-mapped I/O
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = async_sessionmaker(
+    bind=engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
 
 # Create base class for SQLAlchemy models
 Base = declarative_base()
 
 
-def get_db():
+async def get_db():
     """
     Dependency function to get database session.
-    Yields a database session and ensures it is closed after use.
+    Yields an async database session and ensures it is closed after use.
     """
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-def create_tables():
+def _schema_hash() -> str:
     """
-    Create all database tables.
+    Hash the DDL of all tables and indexes defined in the metadata.
     """
-    Base.metadata.create_all(bind=engine) 
+    ddl = []
+    for table in Base.metadata.sorted_tables:
+        ddl.append(str(CreateTable(table).compile(dialect=engine.dialect)))
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            ddl.append(str(CreateIndex(index).compile(dialect=engine.dialect)))
+    return hashlib.sha256("\n".join(ddl).encode()).hexdigest()
+
+
+def _create_schema(connection) -> None:
+    """
+    Create missing tables, then any indexes missing from existing tables.
+    create_all only builds indexes for tables it creates itself.
+    """
+    Base.metadata.create_all(connection)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+async def create_tables() -> bool:
+    """
+    Create all database tables and indexes if the schema has changed since the last run.
+    A file lock ensures only one worker creates the schema when several start at once.
+    
+    Returns:
+        True if the schema was created or updated, False if it was already up to date
+    """
+    schema_hash = _schema_hash()
+    
+    # Blocking on the lock is fine here: nothing is served until startup completes
+    with FileLock(str(SCHEMA_LOCK_PATH)):
+        if (
+            DATABASE_PATH.exists()
+            and SCHEMA_VERSION_PATH.exists()
+            and SCHEMA_VERSION_PATH.read_text() == schema_hash
+        ):
+            return False
+        
+        async with engine.begin() as conn:
+            await conn.run_sync(_create_schema)
+        
+        # Only record the schema as current once tables and indexes both exist
+        SCHEMA_VERSION_PATH.write_text(schema_hash)
+        return True
+
@@ -1,10 +1,15 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from app.routes import questions, evaluate
-from app.database import create_tables
+from app.database import create_tables, engine
+from app.services.result_writer import start_result_writer, stop_result_writer
 import logging
+import multiprocessing
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 logging.basicConfig(level=logging.INFO)
@@ -15,7 +20,8 @@ app = FastAPI(
     description="API for automated OMR sheet evaluation and scoring",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
@@ -26,20 +32,42 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+# Question paper payloads are highly compressible, so compress anything over 1 KiB
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 app.include_router(questions.router, prefix="/api")
 app.include_router(evaluate.router, prefix="/api")
 
 Path("data").mkdir(exist_ok=True)
-Path("uploads").mkdir(exist_ok=True)
 
 @app.on_event("startup")
 async def startup_event():
     try:
-        create_tables()
-        logger.info("Database tables created successfully")
+        if await create_tables():
+            logger.info("Database tables created successfully")
+        else:
+            logger.info("Database schema already up to date")
     except Exception as e:
         logger.error(f"Error creating database tables: {str(e)}")
         raise
+    
+    # Process pool for CPU-bound OMR scoring, so it never blocks the event loop.
+    # Workers are spawned rather than forked because the server process already
+    # runs threads (e.g. aiosqlite connections) when the first worker starts.
+    # The CPUs are shared between all server workers. The pool is created after
+    # the schema step so a failed startup leaves no pool behind.
+    server_workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+    app.state.cv_pool = ProcessPoolExecutor(
+        max_workers=max(1, (os.cpu_count() or 1) // server_workers),
+        mp_context=multiprocessing.get_context("spawn")
+    )
+    await start_result_writer()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_result_writer()
+    app.state.cv_pool.shutdown()
+    await engine.dispose()
 
 @app.get("/")
 async def root():
@@ -47,7 +75,7 @@ async def root():
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail}
     )
@@ -55,17 +83,31 @@ async def http_exception_handler(request, exc):
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
     logger.error(f"Unhandled error: {str(exc)}", exc_info=True)
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={"detail": "Internal server error"}
     )
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(
-        "app.main:app",
-        host="127.0.0.1",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
+    host = os.environ.get("HOST", "127.0.0.1")
+    if os.environ.get("DEV"):
+        uvicorn.run(
+            "app.main:app",
+            host=host,
+            port=8000,
+            reload=True,
+            log_level="info"
+        )
+    else:
+        # Question paper caches are per process and are only invalidated in the
+        # worker that handles the PUT/DELETE, so default to a single worker.
+        # Exported so each worker can size its CV process pool to its share of the CPUs.
+        os.environ.setdefault("WEB_CONCURRENCY", "1")
+        uvicorn.run(
+            "app.main:app",
+            host=host,
+            port=8000,
+            workers=int(os.environ["WEB_CONCURRENCY"]),
+            log_level="warning"
+        )
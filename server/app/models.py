@@ -1,7 +1,7 @@
 ﻿"""
 SQLAlchemy models for the OMR evaluation system.
 """
-from sqlalchemy import Column, Integer, String, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, JSON, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 import uuid
@@ -27,6 +27,10 @@ class Result(Base):
     Stores evaluation results for each student's OMR sheet.
     """
     __tablename__ = "results"
+    # Composite index serves filters on question_paper_id alone or together with roll_number
+    __table_args__ = (
+        Index("ix_results_qp_roll", "question_paper_id", "roll_number"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     roll_number = Column(String, nullable=False, index=True)
@@ -1,13 +1,20 @@
 """
 Evaluation routes module.
 """
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, status, File, UploadFile, Form
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
 from app import models, schemas
 from app.database import get_db
-from app.services.omr_service import evaluate_omr, save_upload_file
+from app.services.omr_service import (
+    PERSIST_UPLOADS,
+    evaluate_omr,
+    evaluate_omr_batch,
+    save_upload_file
+)
+from app.services.result_writer import submit_result
 
 router = APIRouter(
     prefix="/evaluate",
@@ -17,15 +24,17 @@ router = APIRouter(
 
 @router.post("/", response_model=schemas.ResultResponse)
 async def evaluate_omr_sheet(
+    request: Request,
     roll_number: str = Form(...),
     question_paper_id: str = Form(...),
     omr_sheet: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Evaluate an OMR sheet and store the results.
     
     Args:
+        request: Incoming request, used to reach the app's CV process pool
         roll_number: Student's roll number
         question_paper_id: ID of the question paper to evaluate against
         omr_sheet: Uploaded OMR sheet image file
@@ -45,69 +54,163 @@ async def evaluate_omr_sheet(
         )
     
     try:
-        # Save the uploaded file
-        file_path = await save_upload_file(omr_sheet)
+        # Keep a copy of the upload only when debugging
+        if PERSIST_UPLOADS:
+            await save_upload_file(omr_sheet)
+            await omr_sheet.seek(0)
+        
+        # Evaluate the OMR sheet straight from memory
+        image = await omr_sheet.read()
+        marks = await evaluate_omr(
+            image, question_paper_id, db, executor=request.app.state.cv_pool
+        )
         
-        # Evaluate the OMR sheet
-        marks = await evaluate_omr(file_path, question_paper_id, db)
+        # End the read transaction so this request's pooled connection is
+        # returned before waiting on the writer, which needs one of its own
+        await db.commit()
         
-        # Store the result in database
-        result = models.Result(
+        # Store the result in database. The writer coalesces inserts from
+        # concurrent requests into a single commit.
+        result_id = await submit_result(roll_number, question_paper_id, marks)
+        
+        return schemas.ResultResponse(
+            id=result_id,
             roll_number=roll_number,
             question_paper_id=question_paper_id,
             marks=marks
         )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error processing evaluation: {str(e)}"
+        )
+
+@router.post("/batch", response_model=List[schemas.ResultResponse])
+async def evaluate_omr_sheets_batch(
+    request: Request,
+    roll_numbers: List[str] = Form(...),
+    question_paper_id: str = Form(...),
+    omr_sheets: List[UploadFile] = File(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Evaluate several OMR sheets for the same question paper and store all results
+    in a single commit.
+    
+    Args:
+        request: Incoming request, used to reach the app's CV process pool
+        roll_numbers: Students' roll numbers, one per OMR sheet
+        question_paper_id: ID of the question paper to evaluate against
+        omr_sheets: Uploaded OMR sheet image files, in the same order as roll_numbers
+        db: Database session
+    
+    Returns:
+        Evaluation results with marks, in request order
+    
+    Raises:
+        HTTPException: If there's an error in processing or validation
+    """
+    if len(roll_numbers) != len(omr_sheets):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Number of roll numbers must match number of OMR sheets"
+        )
+    
+    # Validate file types
+    for omr_sheet in omr_sheets:
+        if not omr_sheet.content_type.startswith('image/'):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"File {omr_sheet.filename} must be an image"
+            )
+    
+    try:
+        images = []
+        for omr_sheet in omr_sheets:
+            # Keep a copy of the upload only when debugging
+            if PERSIST_UPLOADS:
+                await save_upload_file(omr_sheet)
+                await omr_sheet.seek(0)
+            images.append(await omr_sheet.read())
         
-        db.add(result)
-        db.commit()
-        db.refresh(result)
+        # Evaluate all OMR sheets
+        marks = await evaluate_omr_batch(
+            images, question_paper_id, db, executor=request.app.state.cv_pool
+        )
+        
+        # Store all results with a single commit
+        results = [
+            models.Result(
+                roll_number=roll_number,
+                question_paper_id=question_paper_id,
+                marks=sheet_marks
+            )
+            for roll_number, sheet_marks in zip(roll_numbers, marks)
+        ]
         
-        return result
+        db.add_all(results)
+        await db.commit()
+        
+        return results
     
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error processing evaluation: {str(e)}"
+            detail=f"Error processing batch evaluation: {str(e)}"
         )
 
-@router.get("/results", response_model=List[schemas.ResultResponse])
+@router.get("/results", response_model=schemas.ResultPage)
 async def get_results(
     roll_number: str = None,
     question_paper_id: str = None,
-    skip: int = 0,
+    after_id: Optional[int] = None,
     limit: int = 10,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Get evaluation results with optional filtering.
+    Get evaluation results with optional filtering, ordered by ID.
+    Uses keyset pagination, so each page costs the same regardless of depth.
     
     Args:
         roll_number: Filter by student's roll number
         question_paper_id: Filter by question paper ID
-        skip: Number of records to skip
+        after_id: Return only results with an ID greater than this (next_cursor of the previous page)
         limit: Maximum number of records to return
         db: Database session
     
     Returns:
-        List of evaluation results
+        Page of evaluation results and the cursor for the next page
     """
-    query = db.query(models.Result)
+    # Select only the columns returned to the caller rather than full ORM rows
+    query = select(
+        models.Result.id,
+        models.Result.roll_number,
+        models.Result.question_paper_id,
+        models.Result.marks
+    )
     
     if roll_number:
-        query = query.filter(models.Result.roll_number == roll_number)
+        query = query.where(models.Result.roll_number == roll_number)
     if question_paper_id:
-        query = query.filter(models.Result.question_paper_id == question_paper_id)
+        query = query.where(models.Result.question_paper_id == question_paper_id)
+    if after_id is not None:
+        query = query.where(models.Result.id > after_id)
     
-    results = query.offset(skip).limit(limit).all()
-    return results
+    results = (await db.execute(query.order_by(models.Result.id).limit(limit))).all()
+    next_cursor = results[-1].id if results and len(results) == limit else None
+    return {"items": results, "next_cursor": next_cursor}
 
 @router.get("/results/{result_id}", response_model=schemas.ResultResponse)
 async def get_result(
     result_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get a specific evaluation result by ID.
@@ -122,7 +225,7 @@ async def get_result(
     Raises:
         HTTPException: If result is not found
     """
-    result = db.query(models.Result).filter(models.Result.id == result_id).first()
+    result = await db.get(models.Result, result_id)
     if not result:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,12 +1,14 @@
-﻿"""
+"""
 Question paper routes module.
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 
 from app import models, schemas
 from app.database import get_db
+from app.services.omr_service import get_cached_question_paper, invalidate_question_paper_cache
 
 router = APIRouter(
     prefix="/questions",
@@ -17,7 +19,7 @@ router = APIRouter(
 @router.post("/", response_model=schemas.QuestionPaperResponse, status_code=status.HTTP_201_CREATED)
 async def create_question_paper(
     question_paper: schemas.QuestionPaperCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Create a new question paper.
@@ -37,71 +39,108 @@ async def create_question_paper(
             details=question_paper.details
         )
         db.add(db_question_paper)
-        db.commit()
-        db.refresh(db_question_paper)
+        await db.commit()
         return db_question_paper
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Error creating question paper: {str(e)}"
         )
 
-@router.get("/", response_model=List[schemas.QuestionPaperResponse])
+@router.get("/", response_model=schemas.QuestionPaperPage)
 async def get_question_papers(
-    skip: int = 0,
+    after_id: Optional[str] = None,
     limit: int = 10,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Get all question papers with pagination.
+    Get all question papers with pagination, ordered by ID.
+    Uses keyset pagination, so each page costs the same regardless of depth.
     
     Args:
-        skip: Number of records to skip
+        after_id: Return only question papers with an ID greater than this (next_cursor of the previous page)
         limit: Maximum number of records to return
         db: Database session
     
     Returns:
-        List of question papers
+        Page of question papers and the cursor for the next page
+    """
+    query = select(models.QuestionPaper)
+    
+    if after_id is not None:
+        query = query.where(models.QuestionPaper.id > after_id)
+    
+    question_papers = (await db.execute(
+        query.order_by(models.QuestionPaper.id).limit(limit)
+    )).scalars().all()
+    next_cursor = None
+    if question_papers and len(question_papers) == limit:
+        next_cursor = question_papers[-1].id
+    return {"items": question_papers, "next_cursor": next_cursor}
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag using weak comparison,
+    as RFC 9110 requires for If-None-Match.
+    
+    Args:
+        etag: Current ETag of the resource
+        if_none_match: Value of the If-None-Match request header
+    
+    Returns:
+        True if any listed tag (or "*") matches the current ETag
     """
-    question_papers = db.query(models.QuestionPaper).offset(skip).limit(limit).all()
-    return question_papers
+    opaque_tag = etag.removeprefix("W/")
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == opaque_tag:
+            return True
+    return False
 
 @router.get("/{question_paper_id}", response_model=schemas.QuestionPaperResponse)
 async def get_question_paper(
     question_paper_id: str,
-    db: Session = Depends(get_db)
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get a specific question paper by ID.
+    Responses carry an ETag, and a matching If-None-Match returns 304 Not Modified.
     
     Args:
         question_paper_id: ID of the question paper to retrieve
+        if_none_match: ETags the client already holds
         db: Database session
     
     Returns:
-        Question paper details
+        Question paper details, or an empty 304 response if the client's copy is current
     
     Raises:
         HTTPException: If question paper is not found
     """
-    question_paper = db.query(models.QuestionPaper).filter(
-        models.QuestionPaper.id == question_paper_id
-    ).first()
+    cached = await get_cached_question_paper(db, question_paper_id)
     
-    if not question_paper:
+    if cached is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Question paper with id {question_paper_id} not found"
         )
     
-    return question_paper
+    _, body, etag = cached
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=60"}
+    
+    if if_none_match and _etag_matches(etag, if_none_match):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    # Serve the pre-serialized body directly, skipping response validation
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.put("/{question_paper_id}", response_model=schemas.QuestionPaperResponse)
 async def update_question_paper(
     question_paper_id: str,
     question_paper_update: schemas.QuestionPaperCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Update an existing question paper.
@@ -117,9 +156,7 @@ async def update_question_paper(
     Raises:
         HTTPException: If question paper is not found or update fails
     """
-    db_question_paper = db.query(models.QuestionPaper).filter(
-        models.QuestionPaper.id == question_paper_id
-    ).first()
+    db_question_paper = await db.get(models.QuestionPaper, question_paper_id)
     
     if not db_question_paper:
         raise HTTPException(
@@ -129,11 +166,11 @@ async def update_question_paper(
     
     try:
         db_question_paper.details = question_paper_update.details
-        db.commit()
-        db.refresh(db_question_paper)
+        await db.commit()
+        invalidate_question_paper_cache(question_paper_id)
         return db_question_paper
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Error updating question paper: {str(e)}"
@@ -142,7 +179,7 @@ async def update_question_paper(
 @router.delete("/{question_paper_id}")
 async def delete_question_paper(
     question_paper_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Delete a question paper.
@@ -157,9 +194,7 @@ async def delete_question_paper(
     Raises:
         HTTPException: If question paper is not found
     """
-    db_question_paper = db.query(models.QuestionPaper).filter(
-        models.QuestionPaper.id == question_paper_id
-    ).first()
+    db_question_paper = await db.get(models.QuestionPaper, question_paper_id)
     
     if not db_question_paper:
         raise HTTPException(
@@ -168,11 +203,12 @@ async def delete_question_paper(
         )
     
     try:
-        db.delete(db_question_paper)
-        db.commit()
+        await db.delete(db_question_paper)
+        await db.commit()
+        invalidate_question_paper_cache(question_paper_id)
         return {"message": f"Question paper {question_paper_id} deleted successfully"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Error deleting question paper: {str(e)}"
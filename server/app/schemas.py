@@ -1,28 +1,33 @@
 """
 Pydantic models for request/response validation.
 """
-from pydantic import BaseModel, Field, validator
-from typing import Dict, Optional
-import json
+from pydantic import BaseModel, Field, field_validator
+from typing import Dict, List, Optional
+import orjson
+
+# Keys every question paper's details must contain
+_REQUIRED_DETAILS_FIELDS = frozenset({"questions", "answers"})
 
 
 class QuestionPaperBase(BaseModel):
     """Base schema for question paper data"""
     details: Dict = Field(..., description="Question paper details including questions and answers")
 
-    @validator('details')
+    @field_validator('details', mode='before')
+    @classmethod
     def validate_details(cls, v):
         """Validate that the details dictionary has required fields"""
-        if not isinstance(v, dict):
+        if isinstance(v, (str, bytes)):
             try:
-                v = json.loads(v)
-            except json.JSONDecodeError:
+                v = orjson.loads(v)
+            except orjson.JSONDecodeError:
                 raise ValueError("Invalid JSON format for details")
 
-        required_fields = ["questions", "answers"]
-        for field in required_fields:
-            if field not in v:
-                raise ValueError(f"Missing required field: {field}")
+        # Non-dict values are rejected by the Dict type check that runs next
+        if isinstance(v, dict):
+            missing = _REQUIRED_DETAILS_FIELDS - v.keys()
+            if missing:
+                raise ValueError(f"Missing required fields: {sorted(missing)}")
         return v
 
 
@@ -39,6 +44,12 @@ class QuestionPaperResponse(QuestionPaperBase):
         from_attributes = True
 
 
+class QuestionPaperPage(BaseModel):
+    """Schema for a page of question papers"""
+    items: List[QuestionPaperResponse]
+    next_cursor: Optional[str] = Field(None, description="Pass as after_id to fetch the next page; null on the last page")
+
+
 class ResultBase(BaseModel):
     """Base schema for evaluation results"""
     roll_number: str = Field(..., min_length=1, description="Student's roll number")
@@ -58,6 +69,12 @@ class ResultResponse(ResultCreate):
         from_attributes = True
 
 
+class ResultPage(BaseModel):
+    """Schema for a page of evaluation results"""
+    items: List[ResultResponse]
+    next_cursor: Optional[int] = Field(None, description="Pass as after_id to fetch the next page; null on the last page")
+
+
 class EvaluationRequest(ResultBase):
     """Schema for evaluation request"""
     pass
@@ -1,22 +1,86 @@
 """
 Service for handling OMR sheet evaluation.
 """
+import asyncio
+import hashlib
+import itertools
 import os
 import random
+import sys
+import time
+from concurrent.futures import Executor
 from pathlib import Path
 from fastapi import UploadFile, HTTPException
 import aiofiles
-from typing import Optional
-from sqlalchemy.orm import Session
+import orjson
+from cachetools import TTLCache
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import Text, case, func, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
 from app import models
 
-# Create directory for temporary file storage
+# Uploaded sheets are evaluated in memory. Set PERSIST_UPLOADS=1 to also keep
+# a copy of each upload on disk for debugging.
+PERSIST_UPLOADS = os.environ.get("PERSIST_UPLOADS") == "1"
+
+# Directory for persisted uploads
 UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+if PERSIST_UPLOADS:
+    UPLOAD_DIR.mkdir(exist_ok=True)
+
+# Process-local counter plus pid and start time make persisted filenames unique
+# without drawing from the system random source on every upload
+_upload_counter = itertools.count()
+_UPLOAD_PREFIX = f"{os.getpid()}_{time.time_ns()}"
+
+# sendfile only accepts a regular file as destination on Linux (macOS and
+# FreeBSD require a socket), mirroring shutil's _USE_CP_SENDFILE check
+_USE_SENDFILE = hasattr(os, "sendfile") and sys.platform.startswith("linux")
+
+# Read size used when streaming uploads to disk
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+# Maximum number of sheets scored concurrently within one batch
+BATCH_CONCURRENCY = 8
+
+# Cache of question_paper_id -> total number of questions.
+# Caches are per process and invalidated only in the process handling the update;
+# with several workers the TTL is the only bound on staleness elsewhere.
+_total_questions_cache = TTLCache(maxsize=1024, ttl=300)
+
+# Per-paper invalidation counter. A cache fill records the generation before it
+# queries and stores its result only if no invalidation happened meanwhile, so a
+# read racing with a PUT/DELETE cannot re-cache the old row.
+_cache_generations: Dict[str, int] = {}
+
+# Cache of question_paper_id -> (parsed details, serialized response body, ETag),
+# so repeat reads skip both JSON parsing and response validation.
+_question_paper_cache = TTLCache(maxsize=1024, ttl=300)
+_question_paper_cache_lock = asyncio.Lock()
+
+def _sendfile_copy(src_fd: int, dst_path: Path) -> None:
+    """
+    Copy a file descriptor's contents to a path inside the kernel using sendfile.
+    
+    Args:
+        src_fd: File descriptor of the source file
+        dst_path: Destination path to create or overwrite
+    """
+    size = os.fstat(src_fd).st_size
+    dst_fd = os.open(dst_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        offset = 0
+        while offset < size:
+            sent = os.sendfile(dst_fd, src_fd, offset, size - offset)
+            if sent == 0:
+                break
+            offset += sent
+    finally:
+        os.close(dst_fd)
 
 async def save_upload_file(upload_file: UploadFile) -> Path:
     """
-    Save an uploaded file to the temporary directory.
+    Save an uploaded file to the upload directory.
     
     Args:
         upload_file: The uploaded file from FastAPI
@@ -29,11 +93,22 @@ async def save_upload_file(upload_file: UploadFile) -> Path:
     """
     try:
         # Create unique filename to prevent collisions
-        file_path = UPLOAD_DIR / f"{random.randbytes(8).hex()}_{upload_file.filename}"
+        file_path = UPLOAD_DIR / f"{_UPLOAD_PREFIX}_{next(_upload_counter)}_{upload_file.filename}"
         
-        async with aiofiles.open(file_path, 'wb') as out_file:
-            content = await upload_file.read()
-            await out_file.write(content)
+        # Uploads backed by a real file are copied file-to-file with sendfile on Linux.
+        # fileno() rolls a small in-memory SpooledTemporaryFile onto disk first,
+        # which is acceptable on this debug-only path.
+        try:
+            src_fd = upload_file.file.fileno()
+        except (AttributeError, OSError):
+            src_fd = None
+        
+        if _USE_SENDFILE and src_fd is not None:
+            await asyncio.to_thread(_sendfile_copy, src_fd, file_path)
+        else:
+            async with aiofiles.open(file_path, 'wb') as out_file:
+                while chunk := await upload_file.read(UPLOAD_CHUNK_SIZE):
+                    await out_file.write(chunk)
         
         return file_path
     
@@ -43,23 +118,151 @@ async def save_upload_file(upload_file: UploadFile) -> Path:
             detail=f"Error saving file: {str(e)}"
         )
 
-def cleanup_file(file_path: Path) -> None:
+# Number of entries in details["questions"], matching len() in Python: array
+# elements or object keys, and 0 when the key is missing or holds a scalar
+_QUESTION_COUNT = case(
+    (
+        func.json_type(models.QuestionPaper.details, "$.questions") == "array",
+        func.json_array_length(models.QuestionPaper.details, "$.questions")
+    ),
+    (
+        func.json_type(models.QuestionPaper.details, "$.questions") == "object",
+        select(func.count())
+        .select_from(func.json_each(models.QuestionPaper.details, "$.questions"))
+        .correlate(models.QuestionPaper)
+        .scalar_subquery()
+    ),
+    else_=0
+)
+
+async def _get_total_questions(db: AsyncSession, question_paper_id: str) -> Optional[int]:
     """
-    Remove a temporary file after processing.
+    Get the number of questions in a question paper, using the cache when possible.
+    The count is computed by SQLite's json_array_length (JSON1, built in since
+    SQLite 3.38), so the details blob is never transferred or parsed.
     
     Args:
-        file_path: Path to the file to remove
+        db: Database session for querying question paper details
+        question_paper_id: ID of the question paper
+    
+    Returns:
+        Total number of questions, or None if the question paper does not exist
     """
-    try:
-        if file_path.exists():
-            os.remove(file_path)
-    except Exception as e:
-        print(f"Error cleaning up file {file_path}: {str(e)}")
+    total_questions = _total_questions_cache.get(question_paper_id)
+    if total_questions is not None:
+        return total_questions
+    
+    generation = _cache_generations.get(question_paper_id, 0)
+    
+    # Count the questions inside SQLite (JSON1) instead of loading the details blob
+    total_questions = (await db.execute(
+        select(_QUESTION_COUNT).where(models.QuestionPaper.id == question_paper_id)
+    )).scalar_one_or_none()
+    
+    if total_questions is None:
+        return None
+    
+    if _cache_generations.get(question_paper_id, 0) == generation:
+        _total_questions_cache[question_paper_id] = total_questions
+    return total_questions
+
+async def get_cached_question_paper(
+    db: AsyncSession,
+    question_paper_id: str
+) -> Optional[Tuple[dict, bytes, str]]:
+    """
+    Get a question paper's parsed details, its serialized JSON response body and
+    an ETag for that body. The details are parsed once per cache entry with orjson.
+    
+    Args:
+        db: Database session for querying question paper details
+        question_paper_id: ID of the question paper
+    
+    Returns:
+        Tuple of (details, response body bytes, ETag), or None if the question
+        paper does not exist
+    """
+    cached = _question_paper_cache.get(question_paper_id)
+    if cached is not None:
+        return cached
+    
+    async with _question_paper_cache_lock:
+        # Another request may have filled the entry while we waited
+        cached = _question_paper_cache.get(question_paper_id)
+        if cached is not None:
+            return cached
+        
+        generation = _cache_generations.get(question_paper_id, 0)
+        
+        # Read the raw JSON text so it is parsed only once, by orjson
+        details_json = (await db.execute(
+            select(type_coerce(models.QuestionPaper.details, Text))
+            .where(models.QuestionPaper.id == question_paper_id)
+        )).scalar_one_or_none()
+        
+        if details_json is None:
+            return None
+        
+        details = orjson.loads(details_json)
+        body = orjson.dumps({"details": details, "id": question_paper_id})
+        # Weak tag: GZipMiddleware may re-encode the body, and a strong validator
+        # must differ between content codings
+        etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        cached = (details, body, etag)
+        if _cache_generations.get(question_paper_id, 0) == generation:
+            _question_paper_cache[question_paper_id] = cached
+        return cached
+
+def invalidate_question_paper_cache(question_paper_id: str) -> None:
+    """
+    Drop cached data for a question paper after it is updated or deleted.
+    
+    Args:
+        question_paper_id: ID of the question paper
+    """
+    _cache_generations[question_paper_id] = _cache_generations.get(question_paper_id, 0) + 1
+    _total_questions_cache.pop(question_paper_id, None)
+    _question_paper_cache.pop(question_paper_id, None)
+
+def _score_sheet(image: bytes, total_questions: int) -> int:
+    """
+    Score a single OMR sheet image.
+    
+    Args:
+        image: Contents of the OMR sheet image
+        total_questions: Number of questions in the question paper
+    
+    Returns:
+        Calculated marks (currently random for placeholder)
+    """
+    # TODO: Implement actual OMR processing logic here
+    # For now, return a random score between 0 and total questions
+    return random.randint(0, total_questions)
+
+async def _score_sheet_in_executor(
+    executor: Optional[Executor],
+    image: bytes,
+    total_questions: int
+) -> int:
+    """
+    Run _score_sheet off the event loop.
+    
+    Args:
+        executor: Executor to run scoring in, or None for the loop's default thread pool
+        image: Contents of the OMR sheet image
+        total_questions: Number of questions in the question paper
+    
+    Returns:
+        Calculated marks
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, _score_sheet, image, total_questions)
 
 async def evaluate_omr(
-    file_path: Path,
+    image: bytes,
     question_paper_id: str,
-    db: Session
+    db: AsyncSession,
+    executor: Optional[Executor] = None
 ) -> int:
     """
     Placeholder function for OMR sheet evaluation.
@@ -67,9 +270,10 @@ async def evaluate_omr(
     and compare answers against the stored question paper.
     
     Args:
-        file_path: Path to the uploaded OMR sheet image
+        image: Contents of the uploaded OMR sheet image
         question_paper_id: ID of the question paper to evaluate against
         db: Database session for querying question paper details
+        executor: Executor for the CPU-bound scoring, typically the app's process pool
     
     Returns:
         Calculated marks (currently random for placeholder)
@@ -78,21 +282,17 @@ async def evaluate_omr(
         HTTPException: If question paper is not found or processing fails
     """
     try:
-        # Get question paper details from database
-        question_paper = db.query(models.QuestionPaper).filter(
-            models.QuestionPaper.id == question_paper_id
-        ).first()
+        # Get question paper details from cache or database
+        total_questions = await _get_total_questions(db, question_paper_id)
         
-        if not question_paper:
+        if total_questions is None:
             raise HTTPException(
                 status_code=404,
                 detail=f"Question paper with id {question_paper_id} not found"
             )
         
-        # TODO: Implement actual OMR processing logic here
-        # For now, return a random score between 0 and total questions
-        total_questions = len(question_paper.details.get("questions", []))
-        marks = random.randint(0, total_questions)
+        # Score outside the event loop so other requests keep being served
+        marks = await _score_sheet_in_executor(executor, image, total_questions)
         
         return marks
     
@@ -103,6 +303,51 @@ async def evaluate_omr(
             status_code=500,
             detail=f"Error processing OMR sheet: {str(e)}"
         )
-    finally:
-        # Clean up the uploaded file
-        cleanup_file(file_path)
\ No newline at end of file
+
+async def evaluate_omr_batch(
+    images: List[bytes],
+    question_paper_id: str,
+    db: AsyncSession,
+    executor: Optional[Executor] = None
+) -> List[int]:
+    """
+    Evaluate several OMR sheets against the same question paper.
+    The question paper is looked up once, and sheets are scored concurrently
+    in the executor, at most BATCH_CONCURRENCY at a time.
+    
+    Args:
+        images: Contents of the uploaded OMR sheet images
+        question_paper_id: ID of the question paper to evaluate against
+        db: Database session for querying question paper details
+        executor: Executor for the CPU-bound scoring, typically the app's process pool
+    
+    Returns:
+        Calculated marks for each sheet, in the same order as images
+    
+    Raises:
+        HTTPException: If question paper is not found or processing fails
+    """
+    try:
+        total_questions = await _get_total_questions(db, question_paper_id)
+        
+        if total_questions is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Question paper with id {question_paper_id} not found"
+            )
+        
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        
+        async def grade(image: bytes) -> int:
+            async with semaphore:
+                return await _score_sheet_in_executor(executor, image, total_questions)
+        
+        return list(await asyncio.gather(*(grade(image) for image in images)))
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing OMR sheets: {str(e)}"
+        )
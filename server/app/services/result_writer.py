@@ -0,0 +1,163 @@
+"""
+Service for coalescing result inserts from concurrent requests into shared commits.
+"""
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from app import models
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# How long the writer waits for more results after the first one arrives
+RESULT_BATCH_WINDOW = 0.02  # seconds
+# Maximum number of results stored per commit
+RESULT_BATCH_MAX_SIZE = 64
+
+# Pending item: (roll_number, question_paper_id, marks, future resolved with the new result ID)
+_PendingResult = Tuple[str, str, int, asyncio.Future]
+
+_queue: Optional[asyncio.Queue] = None
+_writer_task: Optional[asyncio.Task] = None
+
+
+async def _commit_results(items: List[_PendingResult]) -> List[int]:
+    """
+    Insert the given results in a single transaction.
+
+    Args:
+        items: Pending results to store
+
+    Returns:
+        Generated result IDs, in the same order as items
+    """
+    results = [
+        models.Result(
+            roll_number=roll_number,
+            question_paper_id=question_paper_id,
+            marks=marks
+        )
+        for roll_number, question_paper_id, marks, _ in items
+    ]
+    async with SessionLocal() as db:
+        db.add_all(results)
+        await db.commit()
+    return [result.id for result in results]
+
+
+def _fail_pending(items: List[_PendingResult], error: Exception) -> None:
+    """
+    Resolve every still-pending request future in items with an error.
+
+    Args:
+        items: Pending results that could not be stored
+        error: Error to raise in each waiting request
+    """
+    for *_, future in items:
+        if not future.done():
+            future.set_exception(error)
+
+
+async def _flush(items: List[_PendingResult]) -> None:
+    """
+    Store a batch of results and resolve each request's future.
+    If the shared commit fails because of a row's data (IntegrityError), results
+    are retried one by one so a single bad row only fails its own request.
+    Any other error, such as a pool or connection failure, fails the whole batch.
+
+    Args:
+        items: Pending results to store
+    """
+    try:
+        result_ids = await _commit_results(items)
+    except IntegrityError as e:
+        if len(items) == 1:
+            _fail_pending(items, e)
+            return
+        logger.warning("Batched result commit failed, retrying %d results individually", len(items))
+        for item in items:
+            await _flush([item])
+        return
+    except Exception as e:
+        _fail_pending(items, e)
+        return
+
+    for (*_, future), result_id in zip(items, result_ids):
+        if not future.done():
+            future.set_result(result_id)
+
+
+async def _writer_loop() -> None:
+    """
+    Collect queued results for up to RESULT_BATCH_WINDOW seconds (or
+    RESULT_BATCH_MAX_SIZE items) and store each batch with one commit.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        items = [await _queue.get()]
+        deadline = loop.time() + RESULT_BATCH_WINDOW
+        while len(items) < RESULT_BATCH_MAX_SIZE:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(_queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        try:
+            await _flush(items)
+        except Exception as e:
+            _fail_pending(items, e)
+        finally:
+            for _ in items:
+                _queue.task_done()
+
+
+async def start_result_writer() -> None:
+    """
+    Start the background task that stores queued results.
+    """
+    global _queue, _writer_task
+    _queue = asyncio.Queue()
+    _writer_task = asyncio.create_task(_writer_loop())
+
+
+async def stop_result_writer() -> None:
+    """
+    Store any results still queued, then stop the background writer task.
+    """
+    global _queue, _writer_task
+    if _writer_task is None:
+        return
+    await _queue.join()
+    _writer_task.cancel()
+    try:
+        await _writer_task
+    except asyncio.CancelledError:
+        pass
+    _queue = None
+    _writer_task = None
+
+
+async def submit_result(roll_number: str, question_paper_id: str, marks: int) -> int:
+    """
+    Queue a result for storage and wait until it has been committed.
+
+    Args:
+        roll_number: Student's roll number
+        question_paper_id: ID of the question paper evaluated against
+        marks: Marks obtained in the evaluation
+
+    Returns:
+        ID of the stored result
+
+    Raises:
+        Exception: Whatever error prevented the result from being stored
+    """
+    future = asyncio.get_running_loop().create_future()
+    await _queue.put((roll_number, question_paper_id, marks, future))
+    return await future